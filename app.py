@@ -2,24 +2,68 @@
 # (used for reading environment variables and generating random data)
 import os
 
+# Import atexit to save the semantic cache index when the process exits
+import atexit
+
+# Import hashlib and json to build deterministic keys for the exact-match cache
+import hashlib
+import json
+
+# Import time to measure how long database queries take
+import time
+
 # Import dotenv's function to load environment variables from a .env file
 from dotenv import load_dotenv
 
 # Import core Flask tools for building web apps
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, g
+
+# Import escape to safely show error messages inside streamed pages
+from markupsafe import escape
 
 # Import Groq API client to interact with the LLM model
+import groq
 from groq import Groq
 
+# Import httpx to configure the Groq client's connection pool and timeouts
+import httpx
+
+# Import Redis client for the exact-match response cache and server-side sessions
+import redis
+
+# Import Flask-Session to keep session data in Redis instead of the cookie
+from flask_session import Session
+
+# Import Flask-Limiter to rate limit expensive endpoints per client IP
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+# Import Flask-Compress to Brotli/gzip-compress HTML responses
+from flask_compress import Compress
+
 # Import SQLAlchemy for ORM (Object Relational Mapping) with Flask
 from flask_sqlalchemy import SQLAlchemy
 
-# Import secure password hashing & verification methods
-from werkzeug.security import generate_password_hash, check_password_hash
+# Import SQLAlchemy event hooks used for slow-query logging
+from sqlalchemy import event
+
+# Import SQLAlchemy statement helpers for the cached user lookup
+from sqlalchemy import bindparam, lambda_stmt, select
+from sqlalchemy.engine import Engine
+
+# Import Argon2id password hashing & verification
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+
+# Import Werkzeug's checker to verify legacy (pre-Argon2) password hashes
+from werkzeug.security import check_password_hash
 
 # Import wraps to preserve function metadata when creating decorators
 from functools import wraps
 
+# Import the semantic cache used to skip Groq calls for near-identical requests
+from llm_cache import SemanticCache
+
 
 # Load environment variables from the .env file into the program
 load_dotenv()
@@ -27,8 +71,39 @@ load_dotenv()
 # Create a new Flask application instance
 app = Flask(__name__)
 
-# Generate a random secret key for sessions (stored in memory during runtime)
-app.secret_key = os.urandom(24)
+# Secret key for signing session cookies. It must come from the environment so
+# every worker uses the same key and sessions survive restarts.
+if not os.getenv("SECRET_KEY"):
+    raise RuntimeError("SECRET_KEY is not set. Add it to your .env file.")
+app.secret_key = os.getenv("SECRET_KEY")
+
+# Previous secret keys (comma-separated) that are still accepted while rotating keys.
+# Only needed for cookie sessions; Redis session IDs are not signed with the key.
+app.config['SECRET_KEY_FALLBACKS'] = [
+    key for key in os.getenv("SECRET_KEY_FALLBACKS", "").split(",") if key
+]
+
+# Redis connection for caching and sessions (disabled when REDIS_URL is not set)
+redis_client = redis.Redis.from_url(os.getenv("REDIS_URL")) if os.getenv("REDIS_URL") else None
+
+# Store sessions server-side in Redis; the cookie only carries a random session ID
+if redis_client is not None:
+    app.config.update(
+        SESSION_TYPE="redis",
+        SESSION_REDIS=redis_client,
+        SESSION_PERMANENT=False,
+    )
+    Session(app)
+
+# Per-IP rate limits, shared across workers through Redis when it is configured
+limiter = Limiter(get_remote_address, app=app, storage_uri=os.getenv("REDIS_URL") or "memory://")
+
+# Compress responses with Brotli (or gzip for older clients). Streamed responses
+# are left alone: the compressor would buffer them and undo the streaming.
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_STREAMS'] = False
+Compress(app)
 
 # Configure the SQLite database path (local database file named app.db)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'  
@@ -36,11 +111,129 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
 # Disable SQLAlchemy's change tracking feature for performance
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Don't log every SQL statement
+app.config['SQLALCHEMY_ECHO'] = False
+
+# Connection pool settings: room for slow /generate requests without starving
+# auth requests, and detect/recycle stale connections before using them
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+
+# Queries slower than this (in seconds) are logged as warnings
+SLOW_QUERY_THRESHOLD = 0.1
+
 # Create the database object linked to our Flask app
 db = SQLAlchemy(app)
 
-# Initialize Groq client with API key from environment variables
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+# Record when each query starts...
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+# ...and log it if it took longer than SLOW_QUERY_THRESHOLD
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    if elapsed > SLOW_QUERY_THRESHOLD:
+        app.logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+# Initialize Groq client with API key from environment variables. Connections are
+# kept alive and reused across requests, and timeouts stop a hung call from tying up a worker.
+client = Groq(
+    api_key=os.getenv("GROQ_API_KEY"),
+    timeout=httpx.Timeout(30.0, connect=5.0),
+    max_retries=2,
+    http_client=groq.DefaultHttpxClient(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+    ),
+)
+
+# How long an exact-match cached statement is kept (in seconds)
+EXACT_CACHE_TTL = 86400
+
+# Argon2id password hasher (parameters tuned for ~10ms per hash)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+# Placeholder in result.html where the generated statement is inserted
+STATEMENT_MARKER = '<!--STATEMENT-->'
+
+# Semantic cache of generated statements (stored next to app.db in the instance folder)
+semantic_cache = SemanticCache(
+    os.path.join(app.instance_path, 'semantic_cache.db'),
+    index_path=os.path.join(app.instance_path, 'semantic_cache.idx'),
+    redis_client=redis_client,
+)
+
+
+# ---------------------- PROMPTS ----------------------
+
+# Static instructions sent as the system message. Kept byte-identical across
+# requests (and ahead of the variable details) so Groq can reuse its prompt cache.
+SYSTEM_PROMPT = """You are an expert project manager with experience in creating detailed project statements.
+You are an expert project strategist.
+
+The user will provide the initial project details (context only — do not simply restate).
+
+Your task:
+1. Invent new and creative project ideas, opportunities, and directions that build on these details.
+2. Suggest approaches the user might not have considered yet.
+3. Incorporate innovative methods, technologies, and strategies.
+4. Highlight unique ways to network, collaborate, or reach the audience.
+5. Keep the tone professional but inspiring.
+6. The statement should be professional statement like question statement.
+
+Output the final result in **pure HTML** with the following structure and tags:
+
+<h2>Project Statement</h2>
+<p>...</p>
+
+<h2>Objectives (This is all about guidance, not the part of statement)</h2>
+<ul><li>...</li></ul>
+
+<h2>Scope</h2>
+<ul><li>...</li></ul>
+
+<h2>Deliverables</h2>
+<ul><li>...</li></ul>
+
+<h2>Success Metrics</h2>
+<ul><li>...</li></ul>
+
+<h2>Tech Stack</h2>
+<ul><li>...</li></ul>
+
+<h2>Tech Approach</h2>
+<ul><li>...</li></ul>
+
+<h2>Potential Challenges</h2>
+<ul><li>...</li></ul>
+
+<h2>Recommended Approach</h2>
+<ul><li>...</li></ul>
+
+Rules:
+- You have to generate a solid problem statement and the it should be professional statement containing statement also with tech stack.
+- Do not repeat the original text exactly.
+- Do not include any introduction or explanation outside the HTML tags.
+- Every section must contain **original suggestions and ideas** that expand beyond the given details.
+"""
+
+# Template for the user message, filled in with the submitted project details
+USER_PROMPT_TEMPLATE = """Here are the initial project details provided (context only — do not simply restate):
+Project Type: {project_type}
+Domain: {domain}
+Goals: {goals}
+Target Audience: {audience}
+Timeline: {timeline}
+Budget: {budget}
+Constraints: {constraints}
+"""
 
 
 # ---------------------- AUTHENTICATION HELPERS ----------------------
@@ -49,7 +242,7 @@ client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:  # If user is not logged in
+        if g.user is None:  # If user is not logged in
             flash("Please log in to continue.", "warning")
             return redirect(url_for('login'))
         return f(*args, **kwargs)  # If logged in, run the original function
@@ -59,32 +252,137 @@ def login_required(f):
 def logout_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' in session:  # If user is already logged in
+        if g.user is not None:  # If user is already logged in
             flash("You are already logged in.", "info")
             return redirect(url_for('index'))
         return f(*args, **kwargs)
     return decorated_function
 
 
+# ---------------------- CACHE HELPERS ----------------------
+
+# Build a deterministic Redis key from the submitted project details
+def exact_cache_key(form_fields):
+    digest = hashlib.sha256(json.dumps(form_fields, sort_keys=True).encode()).hexdigest()
+    return "gen:" + digest
+
+# Fetch a statement from the exact-match cache (None on miss or if Redis is unavailable)
+def get_exact_cached(key):
+    if redis_client is None:
+        return None
+    try:
+        cached = redis_client.get(key)
+    except redis.RedisError as e:
+        app.logger.warning("Exact cache lookup failed: %s", e)
+        return None
+    return cached.decode() if cached is not None else None
+
+# Store a statement in the exact-match cache (errors are logged, never raised)
+def set_exact_cached(key, statement):
+    if redis_client is None:
+        return
+    try:
+        redis_client.set(key, statement, ex=EXACT_CACHE_TTL)
+    except redis.RedisError as e:
+        app.logger.warning("Exact cache store failed: %s", e)
+
+# Log how many prompt tokens Groq served from its own prompt cache
+def log_prompt_cache_usage(usage):
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', 0) if details else 0
+    app.logger.info("Groq prompt tokens: %s (cached: %s)", usage.prompt_tokens, cached_tokens)
+
+# Build a canonical text form of the submitted project details for embedding
+def cache_key_text(form_fields):
+    # Normalize whitespace and case so trivial differences still match
+    return "\n".join(
+        f"{name}: {' '.join((value or '').split()).lower()}"
+        for name, value in form_fields.items()
+    )
+
+
+# ---------------------- PAGE HELPERS ----------------------
+
+# Render result.html once and split it at the statement placeholder, so the
+# generated HTML can be written between the two halves without going through Jinja
+def render_result_shell(form_data):
+    page = render_template('result.html', form_data=form_data)
+    page_head, page_tail = page.split(STATEMENT_MARKER, 1)
+    return page_head, page_tail
+
+
 # ---------------------- DATABASE MODEL ----------------------
 
 # User model for storing login credentials in the database
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)  # Unique user ID
-    username = db.Column(db.String(100), unique=True, nullable=False)  # Username (must be unique)
+    username = db.Column(db.String(100), unique=True, nullable=False, index=True)  # Username (must be unique, indexed for lookups)
     password_hash = db.Column(db.String(200), nullable=False)  # Hashed password
 
     # Method to hash and store password
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
-    # Method to verify if a password matches the stored hash
+    # Method to verify if a password matches the stored hash.
+    # Legacy Werkzeug hashes (and outdated Argon2 parameters) are upgraded
+    # in place on a successful check; the caller commits the change.
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        if not self.password_hash.startswith('$argon2'):
+            if not check_password_hash(self.password_hash, password):
+                return False
+            self.set_password(password)  # Re-hash legacy password with Argon2id
+            return True
+
+        try:
+            password_hasher.verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
+
+
+# Cached statement for looking up a user by username (compiled once, reused on every login)
+_USER_BY_NAME = lambda_stmt(
+    lambda: select(User).where(User.username == bindparam('u')).limit(1)
+)
+
+# Look up a single user by username (uses the ix_user_username index)
+def find_user_by_username(username):
+    return db.session.execute(_USER_BY_NAME, {'u': username}).scalar_one_or_none()
+
+
+# Add the username index to databases created before it was declared on the model
+def ensure_user_indexes():
+    db.session.execute(db.text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_user_username ON user (username)"
+    ))
+    db.session.commit()
     
 
 # ---------------------- ROUTES ----------------------
 
+# Load the logged-in user once per request (available as g.user)
+@app.before_request
+def load_logged_in_user():
+    g.user = None
+    if request.endpoint == 'static' or 'user_id' not in session:
+        return
+    g.user = db.session.get(User, session['user_id'])
+    if g.user is None:
+        session.clear()  # The account no longer exists
+
+# Shown when a client exceeds a rate limit
+@app.errorhandler(429)
+def ratelimit_exceeded(e):
+    flash(f"Too many requests ({e.description}). Please try again later.", "error")
+    if request.endpoint == 'generate':
+        return redirect(url_for('index'))
+    return redirect(request.path)
+
+
 # Home page - accessible only when logged in
 @app.route('/home')
 @login_required
@@ -94,6 +392,7 @@ def index():
 
 # Registration page
 @app.route('/register', methods=['GET', 'POST'])
+@limiter.limit("5/minute", methods=["POST"])
 @logout_required
 def register():
     if request.method == 'POST':
@@ -107,7 +406,7 @@ def register():
             return redirect(url_for('register'))
 
         # Check if username already exists
-        if User.query.filter_by(username=username).first():
+        if find_user_by_username(username):
             flash("Username already exists", "danger")
             return redirect(url_for('register'))
 
@@ -126,6 +425,7 @@ def register():
 
 # Login page
 @app.route('/', methods=['GET', 'POST'])
+@limiter.limit("5/minute", methods=["POST"])
 @logout_required
 def login():
     if request.method == 'POST':
@@ -134,10 +434,12 @@ def login():
         password = request.form['password']
 
         # Search for user in database
-        user = User.query.filter_by(username=username).first()
+        user = find_user_by_username(username)
 
         # Check if user exists and password is correct
         if user and user.check_password(password):
+            db.session.commit()  # Persist any password hash upgrade
+
             # Store login session details
             session['user_id'] = user.id
             session['username'] = user.username
@@ -162,6 +464,7 @@ def logout():
 
 # Generate project statement using Groq API
 @app.route('/generate', methods=['POST'])
+@limiter.limit("20/hour")
 @login_required
 def generate():
     # Get form data
@@ -177,92 +480,154 @@ def generate():
     if not all([project_type, domain, goals]):
         flash('Please fill in all required fields (Project Type, Domain, and Goals)', 'error')
         return redirect(url_for('index'))
-    
-    # Prompt to send to Groq AI for generating project statement
-    prompt = f"""
-You are an expert project strategist.
-
-Here are the initial project details provided (context only — do not simply restate):
-Project Type: {project_type}
-Domain: {domain}
-Goals: {goals}
-Target Audience: {audience if audience else 'Not specified'}
-Timeline: {timeline if timeline else 'Not specified'}
-Budget: {budget if budget else 'Not specified'}
-Constraints: {constraints if constraints else 'None specified'}
-
-Your task:
-1. Invent new and creative project ideas, opportunities, and directions that build on these details.
-2. Suggest approaches the user might not have considered yet.
-3. Incorporate innovative methods, technologies, and strategies.
-4. Highlight unique ways to network, collaborate, or reach the audience.
-5. Keep the tone professional but inspiring.
-6. The statement should be professional statement like question statement.
-
-Output the final result in **pure HTML** with the following structure and tags:
-
-<h2>Project Statement</h2>
-<p>...</p>
-
-<h2>Objectives (This is all about guidance, not the part of statement)</h2>
-<ul><li>...</li></ul>
 
-<h2>Scope</h2>
-<ul><li>...</li></ul>
-
-<h2>Deliverables</h2>
-<ul><li>...</li></ul>
-
-<h2>Success Metrics</h2>
-<ul><li>...</li></ul>
-
-<h2>Tech Stack</h2>
-<ul><li>...</li></ul>
-
-<h2>Tech Approach</h2>
-<ul><li>...</li></ul>
-
-<h2>Potential Challenges</h2>
-<ul><li>...</li></ul>
-
-<h2>Recommended Approach</h2>
-<ul><li>...</li></ul>
-
-Rules:
-- You have to generate a solid problem statement and the it should be professional statement containing statement also with tech stack.
-- Do not repeat the original text exactly.
-- Do not include any introduction or explanation outside the HTML tags.
-- Every section must contain **original suggestions and ideas** that expand beyond the given details.
-"""
+    form_fields = {
+        'project_type': project_type,
+        'domain': domain,
+        'goals': goals,
+        'audience': audience,
+        'timeline': timeline,
+        'budget': budget,
+        'constraints': constraints,
+    }
+
+    # Identical re-submissions are answered straight from Redis
+    exact_key = exact_cache_key(form_fields)
+    cached_statement = get_exact_cached(exact_key)
+    if cached_statement is not None:
+        page_head, page_tail = render_result_shell(request.form)
+        return Response(page_head + cached_statement + page_tail, mimetype='text/html')
+
+    # Look for a previously generated statement for similar project details.
+    # The cache is only an optimization, so if it fails, just call Groq.
+    try:
+        cache_vector = semantic_cache.embed(cache_key_text(form_fields))
+        cached_statement = semantic_cache.lookup(cache_vector)
+    except Exception as e:
+        app.logger.warning("Semantic cache lookup failed: %s", e)
+        cache_vector = None
+        cached_statement = None
+    if cached_statement is not None:
+        # Cache hit - skip the Groq call entirely
+        page_head, page_tail = render_result_shell(request.form)
+        return Response(page_head + cached_statement + page_tail, mimetype='text/html')
+    
+    # Only the small, request-specific part of the prompt goes in the user message
+    prompt = USER_PROMPT_TEMPLATE.format_map({
+        'project_type': project_type,
+        'domain': domain,
+        'goals': goals,
+        'audience': audience or 'Not specified',
+        'timeline': timeline or 'Not specified',
+        'budget': budget or 'Not specified',
+        'constraints': constraints or 'None specified',
+    })
     
     try:
-        # Send request to Groq API to generate project statement
-        response = client.chat.completions.create(
+        # Send request to Groq API and stream the project statement back
+        stream = client.chat.completions.create(
             model="llama3-70b-8192",  # Groq model to use
             messages=[
-                {"role": "system", "content": "You are an expert project manager with experience in creating detailed project statements."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,  # Controls creativity
-            max_tokens=2048   # Maximum length of response
+            max_tokens=2048,  # Maximum length of response
+            stream=True       # Receive tokens as they are generated
         )
-        
-        # Extract generated content from response
-        project_statement = response.choices[0].message.content
-        
-        # Render the result page with generated statement and form data
-        return render_template('result.html', 
-                              project_statement=project_statement,
-                              form_data=request.form)
+
+    except groq.APITimeoutError:
+        # Groq took too long to respond
+        flash('The AI service is taking too long to respond. Please try again in a moment.', 'error')
+        return redirect(url_for('index'))
     
     except Exception as e:
         # Handle any API errors
         flash(f'Error generating project statement: {str(e)}', 'error')
         return redirect(url_for('index'))
 
+    # Result page around the statement, sent before and after the streamed tokens
+    page_head, page_tail = render_result_shell(request.form)
+
+    def stream_result():
+        yield page_head
+        chunks = []  # Collected output, cached once the stream completes
+        finish_reason = None  # Why the model stopped ("stop", "length", ...)
+        try:
+            for chunk in stream:
+                if chunk.x_groq is not None and chunk.x_groq.usage is not None:
+                    log_prompt_cache_usage(chunk.x_groq.usage)
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    chunks.append(content)
+                    yield content
+        except Exception as e:
+            # Headers are already sent, so report the error inside the page
+            app.logger.error("Groq stream failed: %s", e)
+            yield f'<div class="alert alert-danger">Error generating project statement: {escape(str(e))}</div>'
+            yield page_tail
+            return
+        yield page_tail
+
+        # Only cache complete, non-empty statements (not ones cut off at max_tokens)
+        project_statement = "".join(chunks)
+        if not project_statement.strip() or finish_reason != "stop":
+            return
+
+        # Remember this statement for future identical and similar requests.
+        # The page has already been sent, so failures are logged, never raised.
+        set_exact_cached(exact_key, project_statement)
+        if cache_vector is None:
+            return  # The semantic cache was unavailable for this request
+        try:
+            semantic_cache.store(cache_vector, project_statement)
+        except Exception as e:
+            app.logger.warning("Semantic cache store failed: %s", e)
+
+    return Response(stream_with_context(stream_result()), mimetype='text/html')
+
+
+# Semantic cache hit/miss counters
+@app.route('/cache_stats')
+@login_required
+def cache_stats():
+    return jsonify(semantic_cache.stats)
+
 
 # ---------------------- MAIN ENTRY POINT ----------------------
-if __name__ == '__main__':
+
+# Create tables and run migrations. Run once per deployment (in the Gunicorn
+# master), not in every worker, so workers never race each other on the schema.
+def init_db():
     with app.app_context():
         db.create_all()  # Ensure database and tables are created
+        ensure_user_indexes()  # Migrate existing databases
+        db.engine.dispose()  # Don't hand pooled connections over to forked workers
+
+
+# Load slow per-process resources before serving traffic, so the first
+# requests don't pay for model loading or index building. Failures are only
+# logged and never stop the worker. Each request then retries the semantic cache
+# and, if it still fails, skips it and calls Groq directly.
+def warmup():
+    # Load the embedding model and FAISS index, and save the index on exit
+    try:
+        semantic_cache.warmup()
+    except Exception as e:
+        app.logger.warning("Semantic cache warmup failed, requests will retry or skip it: %s", e)
+    atexit.register(semantic_cache.save_index)
+
+    # Open the Redis connection now rather than on the first request
+    if redis_client is not None:
+        try:
+            redis_client.ping()
+        except redis.RedisError as e:
+            app.logger.warning("Redis is not reachable: %s", e)
+
+
+if __name__ == '__main__':
+    init_db()
+    warmup()
     app.run(host="0.0.0.0", port=4000)  # Start Flask server on port 4000
@@ -0,0 +1,28 @@
+# Gunicorn settings for running the app in production:  gunicorn app:app
+
+# Import OS module to read settings from environment variables
+import os
+
+# Address and port to listen on (same port as the development server)
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:4000")
+
+# Threaded workers: a thread waiting on a Groq response only blocks itself,
+# so a few processes can serve many in-flight /generate requests at once
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+
+# Allow slow Groq generations (client timeout is 30s, plus retries) to finish
+timeout = 120
+
+
+# Create tables and run migrations once, in the master, before any worker starts
+def on_starting(server):
+    from app import init_db
+    init_db()
+
+
+# Warm up each worker (embedding model, cache index) before it takes requests
+def post_worker_init(worker):
+    from app import warmup
+    warmup()
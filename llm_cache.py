@@ -0,0 +1,222 @@
+# Import OS module to build file paths for the cache database
+import os
+
+# Import sqlite3 to persist cached statements next to the main database
+import sqlite3
+
+# Import threading so the FAISS index is safe to use from Flask's worker threads
+import threading
+
+# Import time to stamp cache entries and expire them after their TTL
+import time
+
+# Import NumPy for the embedding vectors stored in the index
+import numpy as np
+
+# Import FAISS for fast similarity search over the cached embeddings
+import faiss
+
+# Import Redis errors so a Redis outage only falls back to local counters
+import redis
+
+
+# Redis key prefix for the shared hit/miss counters
+STATS_KEY = "semantic_cache:stats:"
+
+
+# ---------------------- SEMANTIC CACHE ----------------------
+
+# Caches generated statements by the *meaning* of the submitted form, so that
+# near-identical project details reuse a previous answer instead of calling Groq
+class SemanticCache:
+    def __init__(self, db_path, index_path=None, model_name="all-MiniLM-L6-v2", threshold=0.92, ttl=86400,
+                 redis_client=None):
+        self.db_path = db_path  # SQLite sidecar file holding (vector, statement) pairs
+        self.index_path = index_path  # Optional file the FAISS index is saved to/loaded from
+        self.model_name = model_name  # Sentence-transformers model used for embeddings
+        self.threshold = threshold  # Minimum cosine similarity that counts as a hit
+        self.ttl = ttl  # Seconds before a cached statement is considered stale
+        self.redis_client = redis_client  # Optional Redis for hit/miss counters shared by all workers
+
+        self._stats = {"hits": 0, "misses": 0}  # Per-process counters (used without Redis)
+        self._stats_lock = threading.Lock()  # Guards the per-process counters
+
+        self._model = None  # Embedding model (loaded on first use)
+        self._index = None  # FAISS index (built on first use)
+        self._last_id = 0  # Highest SQLite row id already added to the index
+        self._lock = threading.Lock()  # Guards the index and the SQLite connection
+
+        self._connection = None  # SQLite connection (opened on first use)
+
+    # Open (or create) the sidecar database on first use. Opening lazily keeps the
+    # connection out of the Gunicorn master, so forked workers each get their own.
+    @property
+    def _conn(self):
+        if self._connection is None:
+            # The file is shared by every worker process, so use WAL mode and
+            # wait for locks instead of failing
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._migrate(conn)
+            conn.commit()
+            self._connection = conn
+        return self._connection
+
+    # Create the entries table, or recreate it if it was made before ids used
+    # AUTOINCREMENT. Without it SQLite reuses the highest id after a delete, and a
+    # worker's index (or the saved index file) would map the old vector to the new row.
+    def _migrate(self, conn):
+        conn.execute("BEGIN IMMEDIATE")  # One worker migrates, the others wait
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'entries'"
+        ).fetchone()
+        if row is not None and "AUTOINCREMENT" not in row[0].upper():
+            # Cached statements are disposable - start over rather than remap ids
+            conn.execute("DROP TABLE entries")
+            if self.index_path and os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, vector BLOB NOT NULL, "
+            "statement TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    # Hit/miss counters: totals for all workers when Redis is configured,
+    # otherwise the counts of this process only
+    @property
+    def stats(self):
+        if self.redis_client is not None:
+            try:
+                hits, misses = self.redis_client.mget(STATS_KEY + "hits", STATS_KEY + "misses")
+                return {"hits": int(hits or 0), "misses": int(misses or 0)}
+            except redis.RedisError:
+                pass  # Fall back to this process's counts
+        with self._stats_lock:
+            return dict(self._stats)
+
+    # Increment one of the hit/miss counters (never touches SQLite)
+    def _count(self, name):
+        if self.redis_client is not None:
+            try:
+                self.redis_client.incr(STATS_KEY + name)
+                return
+            except redis.RedisError:
+                pass  # Fall back to counting in this process
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    # Load the embedding model the first time it is needed
+    def _get_model(self):
+        if self._model is None:
+            # Imported here because loading torch is slow and only needed once
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    # Load the FAISS index from disk (or rebuild it from SQLite), then add any
+    # rows that other worker processes have stored since
+    def _get_index(self):
+        if self._index is None:
+            index = self._read_index()
+            self._index = index if index is not None else self._build_index()
+            ids = faiss.vector_to_array(self._index.id_map)
+            self._last_id = int(ids.max()) if ids.size else 0
+        self._sync_index()
+        return self._index
+
+    # Read the saved index. Rows deleted since it was saved are evicted lazily by
+    # lookup(), and rows added since are picked up by _sync_index().
+    def _read_index(self):
+        self._conn  # Open the database first so an outdated index file is migrated away
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        return faiss.read_index(self.index_path)
+
+    # Add SQLite rows newer than the last one seen (including other workers' rows)
+    def _sync_index(self):
+        rows = self._conn.execute(
+            "SELECT id, vector FROM entries WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if rows:
+            ids = np.array([row[0] for row in rows], dtype="int64")
+            vectors = np.vstack([np.frombuffer(row[1], dtype="float32") for row in rows])
+            self._index.add_with_ids(vectors, ids)
+            self._last_id = rows[-1][0]
+
+    # Build a fresh index from the unexpired rows stored in SQLite
+    def _build_index(self):
+        # Expired entries would never be returned, so drop them first
+        self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.commit()
+
+        dim = self._get_model().get_sentence_embedding_dimension()
+        # Inner product over L2-normalized vectors == cosine similarity
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        rows = self._conn.execute("SELECT id, vector FROM entries").fetchall()
+        if rows:
+            ids = np.array([row[0] for row in rows], dtype="int64")
+            vectors = np.vstack([np.frombuffer(row[1], dtype="float32") for row in rows])
+            index.add_with_ids(vectors, ids)
+        return index
+
+    # Load the embedding model and index up front so the first request doesn't pay for it
+    def warmup(self):
+        with self._lock:
+            self._get_model()
+            self._get_index()
+
+    # Write the index to disk so the next start can skip rebuilding it
+    def save_index(self):
+        if not self.index_path or self._index is None:
+            return
+        with self._lock:
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            faiss.write_index(self._index, tmp_path)
+            os.replace(tmp_path, self.index_path)  # Atomic, so readers never see a partial file
+
+    # Turn a piece of text into a normalized float32 row vector
+    def embed(self, text):
+        vector = self._get_model().encode([text], normalize_embeddings=True)
+        return np.asarray(vector, dtype="float32")
+
+    # Return the cached statement closest to `vector`, or None on a miss
+    def lookup(self, vector):
+        statement = self._search(vector)
+        self._count("hits" if statement is not None else "misses")  # Counted outside the lock
+        return statement
+
+    # Find the closest unexpired statement in the index
+    def _search(self, vector):
+        with self._lock:
+            index = self._get_index()
+            if index.ntotal:
+                scores, ids = index.search(vector, 1)
+                if scores[0][0] >= self.threshold:
+                    entry_id = int(ids[0][0])
+                    row = self._conn.execute(
+                        "SELECT statement, created_at FROM entries WHERE id = ?",
+                        (entry_id,),
+                    ).fetchone()
+                    if row and row[1] >= time.time() - self.ttl:
+                        return row[0]
+                    # Entry is missing or expired - drop it from the index
+                    self._evict(entry_id)
+            return None
+
+    # Store a freshly generated statement under its embedding
+    def store(self, vector, statement):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO entries (vector, statement, created_at) VALUES (?, ?, ?)",
+                (vector.tobytes(), statement, time.time()),
+            )
+            self._conn.commit()
+            self._get_index()  # Adds the new row (and any from other workers)
+
+    # Remove a single entry from both the index and SQLite
+    def _evict(self, entry_id):
+        self._index.remove_ids(np.array([entry_id], dtype="int64"))
+        self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+        self._conn.commit()